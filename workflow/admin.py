@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import WorkflowDocument, ApprovalRecord
+from .models import WorkflowDocument, ApprovalRecord, ApprovalGroupCounter, ArchivedDocument
 
 @admin.register(WorkflowDocument)
 class WorkflowDocumentAdmin(admin.ModelAdmin):
@@ -10,6 +10,19 @@ class WorkflowDocumentAdmin(admin.ModelAdmin):
 
 @admin.register(ApprovalRecord)
 class ApprovalRecordAdmin(admin.ModelAdmin):
-    list_display = ['document', 'approver', 'status', 'approved_at']
-    list_filter = ['status', 'approved_at']
-    search_fields = ['document__id', 'approver__username']
\ No newline at end of file
+    list_display = ['document', 'approver', 'group', 'status', 'approved_at']
+    list_filter = ['status', 'group', 'approved_at']
+    search_fields = ['document__id', 'approver__username']
+
+@admin.register(ApprovalGroupCounter)
+class ApprovalGroupCounterAdmin(admin.ModelAdmin):
+    list_display = ['document', 'group', 'approved', 'required']
+    list_filter = ['group']
+    search_fields = ['document__id']
+
+@admin.register(ArchivedDocument)
+class ArchivedDocumentAdmin(admin.ModelAdmin):
+    list_display = ['id', 'created_by', 'created_at', 'completed_at', 'archived_at']
+    list_filter = ['completed_at', 'archived_at']
+    search_fields = ['id', 'created_by__username']
+    readonly_fields = ['snapshot', 'archived_at']
\ No newline at end of file
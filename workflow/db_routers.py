@@ -0,0 +1,88 @@
+import random
+import time
+from contextlib import suppress
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+# Set by ReplicaRoutingMiddleware for safe requests that are not pinned to
+# the primary; everything else (writes, management commands) stays there.
+read_from_replica = ContextVar('read_from_replica', default=False)
+
+# The replica alias and error of the last failed replica query in the
+# current request, recorded by ReplicaRoutingMiddleware
+replica_error = ContextVar('replica_error', default=None)
+
+
+class ReadReplicaRouter:
+    # Sends reads to one of WORKFLOW_READ_REPLICAS while read_from_replica
+    # is set, and every write to the primary. A replica that fails its
+    # probe query, or a query during a request, is skipped for
+    # WORKFLOW_REPLICA_RETRY_AFTER seconds and reads fall back to the
+    # primary when none are left.
+    health_check_interval = 5
+
+    def __init__(self):
+        self.checked_until = {}
+        self.unhealthy_until = {}
+
+    def db_for_read(self, model, **hints):
+        if not read_from_replica.get():
+            return DEFAULT_DB_ALIAS
+
+        replicas = [alias for alias in self.get_replicas() if self.is_healthy(alias)]
+        if not replicas:
+            return DEFAULT_DB_ALIAS
+
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        pool = {DEFAULT_DB_ALIAS, *self.get_replicas()}
+        if obj1._state.db in pool and obj2._state.db in pool:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
+
+    def get_replicas(self):
+        return getattr(settings, 'WORKFLOW_READ_REPLICAS', [])
+
+    def is_healthy(self, alias):
+        now = time.monotonic()
+        if self.unhealthy_until.get(alias, 0) > now:
+            return False
+        if self.checked_until.get(alias, 0) > now:
+            return True
+
+        if not self.probe(alias):
+            self.mark_unhealthy(alias)
+            return False
+
+        self.checked_until[alias] = now + self.health_check_interval
+        return True
+
+    def probe(self, alias):
+        # Query a migrated table, so an empty or half-restored replica is
+        # not mistaken for a healthy one
+        from .models import WorkflowDocument
+
+        connection = connections[alias]
+        table = connection.ops.quote_name(WorkflowDocument._meta.db_table)
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(f'SELECT 1 FROM {table} LIMIT 1')
+        except DatabaseError:
+            return False
+        return True
+
+    def mark_unhealthy(self, alias):
+        with suppress(DatabaseError):
+            connections[alias].close()
+        retry_after = getattr(settings, 'WORKFLOW_REPLICA_RETRY_AFTER', 30)
+        self.unhealthy_until[alias] = time.monotonic() + retry_after
+        self.checked_until.pop(alias, None)
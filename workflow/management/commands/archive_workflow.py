@@ -0,0 +1,97 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from workflow.models import (
+    WorkflowDocument,
+    WorkflowStage,
+    ArchivedDocument,
+    ArchivedApprovalRecord
+)
+from workflow.serializers import WorkflowDocumentSerializer
+
+class Command(BaseCommand):
+    help = 'Move completed documents and their approvals into the archive tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, required=True,
+                            help='Archive documents completed more than this many days ago')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only report how many documents would be archived')
+
+    def handle(self, *args, **options):
+        if options['older_than'] < 0:
+            raise CommandError('--older-than must not be negative')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        cutoff = timezone.now() - timedelta(days=options['older_than'])
+        candidates = WorkflowDocument.objects.filter(
+            current_stage=WorkflowStage.COMPLETED,
+            updated_at__lt=cutoff
+        )
+
+        # Ids that are already archived (after a manual restore, or on a
+        # backend that reuses ids) are left in place and reported
+        archived_ids = ArchivedDocument.objects.values('id')
+        conflicts = list(candidates.filter(id__in=archived_ids).order_by('id').values_list('id', flat=True))
+        if conflicts:
+            self.stderr.write(
+                'Skipping documents that are already archived: '
+                + ', '.join(str(pk) for pk in conflicts)
+            )
+        candidates = candidates.exclude(id__in=archived_ids)
+
+        if options['dry_run']:
+            self.stdout.write(f'{candidates.count()} documents would be archived')
+            return
+
+        total = 0
+        while True:
+            ids = list(candidates.order_by('id').values_list('id', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            total += self.archive_batch(ids)
+            self.stdout.write(f'Archived {total} documents')
+
+        self.stdout.write(self.style.SUCCESS(f'Archiving completed! {total} documents archived.'))
+
+    @transaction.atomic
+    def archive_batch(self, ids):
+        documents = list(
+            WorkflowDocument.objects.filter(id__in=ids)
+            .select_related('created_by')
+            .prefetch_related('approvals__approver')
+        )
+
+        archived_documents = []
+        archived_approvals = []
+        for document in documents:
+            snapshot = WorkflowDocumentSerializer(document, context={}).data
+            archived = ArchivedDocument(
+                id=document.id,
+                created_by=document.created_by,
+                snapshot=snapshot,
+                created_at=document.created_at,
+                completed_at=document.updated_at
+            )
+            archived_documents.append(archived)
+            archived_approvals.extend(
+                ArchivedApprovalRecord(
+                    document=archived,
+                    approver_id=approval.approver_id,
+                    group=approval.group,
+                    status=approval.status,
+                    approved_at=approval.approved_at
+                )
+                for approval in document.approvals.all()
+            )
+
+        ArchivedDocument.objects.bulk_create(archived_documents)
+        ArchivedApprovalRecord.objects.bulk_create(archived_approvals)
+
+        # Approval records and quorum counters go with their documents
+        WorkflowDocument.objects.filter(id__in=[document.id for document in documents]).delete()
+        return len(documents)
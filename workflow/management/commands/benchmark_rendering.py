@@ -0,0 +1,82 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.contrib.auth.models import User
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from workflow.middleware import brotli, compress_content
+from workflow.models import WorkflowDocument, ApprovalRecord
+from workflow.renderers import FastJSONRenderer, orjson
+from workflow.serializers import WorkflowDocumentSerializer
+
+class Command(BaseCommand):
+    help = 'Measure list payload render time and size on the wire'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000])
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        users = [User(pk=i, username=f'user{i}') for i in range(1, 5)]
+        now = timezone.now()
+
+        if orjson is None:
+            self.stdout.write('orjson is not installed, FastJSONRenderer uses the stdlib fallback')
+        if brotli is None:
+            self.stdout.write('brotli is not installed, skipping br')
+
+        for size in options['sizes']:
+            documents = [self.build_document(pk, users, now) for pk in range(1, size + 1)]
+            data = WorkflowDocumentSerializer(documents, many=True, context={}).data
+
+            self.stdout.write(f'{size} documents:')
+            for name, renderer in [('JSONRenderer', JSONRenderer()), ('FastJSONRenderer', FastJSONRenderer())]:
+                elapsed, content = self.time_render(renderer, data, options['repeat'])
+                self.stdout.write(f'  {name}: {elapsed * 1000:.1f} ms, {len(content)} bytes')
+
+            encodings = ['gzip'] + (['br'] if brotli is not None else [])
+            for encoding in encodings:
+                start = time.perf_counter()
+                compressed = compress_content(content, encoding)
+                elapsed = time.perf_counter() - start
+                self.stdout.write(
+                    f'  {encoding}: {elapsed * 1000:.1f} ms, {len(compressed)} bytes '
+                    f'({len(compressed) / len(content):.1%} of identity)'
+                )
+
+        self.stdout.write(self.style.SUCCESS('Benchmark completed!'))
+
+    def build_document(self, pk, users, now):
+        document = WorkflowDocument(
+            id=pk,
+            current_stage='APPROVAL',
+            current_filler_step=3,
+            created_by=users[0],
+            created_at=now,
+            updated_at=now,
+            **{f'field{i}': f'Value for field {i} of document {pk}' for i in range(1, 12)}
+        )
+        # Serve the nested approvals from the prefetch cache, not the database
+        document._prefetched_objects_cache = {'approvals': [
+            ApprovalRecord(
+                id=pk * 10 + n,
+                document=document,
+                approver=user,
+                group='ApproverGroup',
+                status='APPROVED',
+                comments='Looks good',
+                approved_at=now,
+                created_at=now
+            )
+            for n, user in enumerate(users)
+        ]}
+        return document
+
+    def time_render(self, renderer, data, repeat):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            content = renderer.render(data)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, content
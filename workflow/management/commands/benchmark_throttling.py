@@ -0,0 +1,68 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.contrib.auth.models import User
+from django.http import HttpResponse
+from django.test import RequestFactory
+from rest_framework.request import Request
+from workflow.middleware import LoadSheddingMiddleware
+from workflow.throttling import WorkflowRateThrottle, get_throttle_store
+
+class Command(BaseCommand):
+    help = 'Measure the per-request overhead of the rate limiter and load shedder'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=100000)
+        parser.add_argument('--users', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        users = [User(pk=i, username=f'bench{i}') for i in range(1, options['users'] + 1)]
+        factory = RequestFactory()
+
+        # Rate limiter: one throttle per request, as DRF does
+        class View:
+            action = 'list'
+            throttle_scopes = {'list': 'list'}
+
+        view = View()
+        requests = []
+        for user in users:
+            request = Request(factory.get('/api/documents/'))
+            request.user = user
+            requests.append(request)
+
+        class BenchmarkThrottle(WorkflowRateThrottle):
+            THROTTLE_RATES = {'list': f'{iterations}/min'}
+
+        get_throttle_store().clear()
+        start = time.perf_counter()
+        for i in range(iterations):
+            BenchmarkThrottle().allow_request(requests[i % len(requests)], view)
+        elapsed = time.perf_counter() - start
+        get_throttle_store().clear()
+        self.report('rate limiter', iterations, elapsed)
+
+        # Load shedder against a no-op view
+        response = HttpResponse()
+        baseline = lambda request: response
+        middleware = LoadSheddingMiddleware(baseline)
+        middleware.max_inflight = 64
+        request = factory.get('/api/documents/')
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            baseline(request)
+        baseline_elapsed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            middleware(request)
+        elapsed = time.perf_counter() - start
+        self.report('load shedder', iterations, elapsed - baseline_elapsed)
+
+        self.stdout.write(self.style.SUCCESS('Benchmark completed!'))
+
+    def report(self, name, iterations, elapsed):
+        per_call = elapsed / iterations * 1e6
+        self.stdout.write(f'{name}: {iterations} calls in {elapsed:.3f}s ({per_call:.2f} us/call)')
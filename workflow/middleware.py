@@ -0,0 +1,239 @@
+import threading
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DatabaseError, connections, router
+from django.http import JsonResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from .db_routers import ReadReplicaRouter, read_from_replica, replica_error
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def get_accepted_encodings(accept_encoding):
+    # Parse an Accept-Encoding header into the codings with a non-zero q
+    accepted = set()
+    for item in accept_encoding.split(','):
+        coding, _, params = item.strip().partition(';')
+        quality = params.strip()
+        if quality.startswith('q='):
+            try:
+                if float(quality[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        if coding:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+def compress_content(content, encoding):
+    if encoding == 'br':
+        return brotli.compress(content, quality=4)
+    # Random gzip padding, as in GZipMiddleware, to mitigate BREACH
+    return compress_string(content, max_random_bytes=100)
+
+
+class LoadSheddingMiddleware:
+    # Rejects requests with 503 once more than WORKFLOW_MAX_INFLIGHT_REQUESTS
+    # are being handled by this process, instead of queueing them behind
+    # work that is already saturating the workers.
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.max_inflight = getattr(settings, 'WORKFLOW_MAX_INFLIGHT_REQUESTS', None)
+        self.retry_after = getattr(settings, 'WORKFLOW_SHED_RETRY_AFTER', 1)
+        self.inflight = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, request):
+        if self.max_inflight is None:
+            return self.get_response(request)
+
+        with self.lock:
+            if self.inflight >= self.max_inflight:
+                shed = True
+            else:
+                shed = False
+                self.inflight += 1
+
+        if shed:
+            response = JsonResponse(
+                {'error': 'Server is busy, please retry later'},
+                status=503
+            )
+            response['Retry-After'] = str(self.retry_after)
+            return response
+
+        try:
+            return self.get_response(request)
+        finally:
+            with self.lock:
+                self.inflight -= 1
+
+
+class CompressionMiddleware:
+    # Compresses responses of at least WORKFLOW_COMPRESSION_MIN_SIZE bytes
+    # with brotli (when installed) or gzip, depending on what the client
+    # accepts. Smaller bodies are sent as-is since compressing them costs
+    # more CPU than it saves on the wire. Disabled while the setting is None.
+    # Only JSON is compressed, so HTML pages carrying a CSRF token (such as
+    # the browsable API) are never exposed to BREACH.
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.min_size = getattr(settings, 'WORKFLOW_COMPRESSION_MIN_SIZE', None)
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        if self.min_size is None:
+            return response
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        if not response.get('Content-Type', '').startswith('application/json'):
+            return response
+        if len(response.content) < self.min_size:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        accepted = get_accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if brotli is not None and 'br' in accepted:
+            encoding = 'br'
+        elif 'gzip' in accepted:
+            encoding = 'gzip'
+        else:
+            return response
+
+        compressed = compress_content(response.content, encoding)
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+
+        # The body changed, so a strong ETag no longer matches it
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+
+        response['Content-Encoding'] = encoding
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    # Lets ReadReplicaRouter serve safe requests from a replica, except for
+    # users who wrote something in the last WORKFLOW_PIN_TO_PRIMARY_SECONDS:
+    # their reads stay on the primary so they always see their own writes.
+    # Users are identified by the JWT user id claim (or the session user)
+    # and pins are kept in the WORKFLOW_PIN_CACHE cache, which has to be
+    # shared by every worker.
+    safe_methods = ('GET', 'HEAD', 'OPTIONS')
+    cache_format = 'workflow_pin_%s'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = bool(getattr(settings, 'WORKFLOW_READ_REPLICAS', []))
+        self.pin_seconds = getattr(settings, 'WORKFLOW_PIN_TO_PRIMARY_SECONDS', 5)
+
+        if self.enabled:
+            self.pins = caches[getattr(settings, 'WORKFLOW_PIN_CACHE', 'default')]
+            if isinstance(self.pins, LocMemCache):
+                raise ImproperlyConfigured(
+                    'WORKFLOW_PIN_CACHE must name a cache shared by all workers '
+                    '(e.g. database, Redis or Memcached), not a local-memory cache'
+                )
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+
+        ident = self.get_ident(request)
+        use_replica = request.method in self.safe_methods and not (
+            ident is not None and self.pins.get(self.cache_format % ident)
+        )
+
+        token = read_from_replica.set(use_replica)
+        error_token = replica_error.set(None)
+        try:
+            with ExitStack() as stack:
+                if use_replica:
+                    for alias in self.get_replicas():
+                        stack.enter_context(connections[alias].execute_wrapper(self.record_replica_error))
+                response = self.get_response(request)
+        finally:
+            replica_error.reset(error_token)
+            read_from_replica.reset(token)
+
+        if request.method not in self.safe_methods and response.status_code < 400 and ident is not None:
+            self.pins.set(self.cache_format % ident, True, self.pin_seconds)
+
+        return response
+
+    def record_replica_error(self, execute, sql, params, many, context):
+        try:
+            return execute(sql, params, many, context)
+        except DatabaseError as exc:
+            replica_error.set((context['connection'].alias, exc))
+            raise
+
+    def process_exception(self, request, exception):
+        # Fail over only when the exception is (or was raised from) an error
+        # of a replica query; errors from the primary are left alone.
+        recorded = replica_error.get()
+        if recorded is None or not read_from_replica.get():
+            return None
+        alias, error = recorded
+        if not any(exc is error for exc in self.exception_chain(exception)):
+            return None
+
+        for db_router in router.routers:
+            if isinstance(db_router, ReadReplicaRouter):
+                db_router.mark_unhealthy(alias)
+
+        # Handle the (safe) request again against the primary. Note that this
+        # runs every middleware below this one, and the view, a second time.
+        read_from_replica.set(False)
+        replica_error.set(None)
+        return self.get_response(request)
+
+    def exception_chain(self, exception):
+        seen = set()
+        while exception is not None and id(exception) not in seen:
+            seen.add(id(exception))
+            yield exception
+            exception = exception.__cause__ or exception.__context__
+
+    def get_replicas(self):
+        return getattr(settings, 'WORKFLOW_READ_REPLICAS', [])
+
+    def get_ident(self, request):
+        # Read the user id from the bearer token without touching the
+        # database, falling back to a session login
+        authentication = JWTAuthentication()
+        header = authentication.get_header(request)
+        if header is not None:
+            try:
+                raw_token = authentication.get_raw_token(header)
+                if raw_token is not None:
+                    validated_token = authentication.get_validated_token(raw_token)
+                    return validated_token.get(jwt_settings.USER_ID_CLAIM)
+            except (AuthenticationFailed, InvalidToken):
+                return None
+
+        session = getattr(request, 'session', None)
+        if session is not None:
+            return session.get(SESSION_KEY)
+        return None
@@ -1,6 +1,17 @@
 from django.db import models
+from django.conf import settings
 from django.contrib.auth.models import User
 
+APPROVER_GROUPS = ['FillerGroup1', 'FillerGroup2', 'FillerGroup3', 'ApproverGroup']
+
+def get_group_quorum(group_name, group_size):
+    # WORKFLOW_APPROVAL_QUORUM maps a group name to the number of approvals
+    # it needs; groups that are not listed (or set to 'all') need everyone.
+    quorum = getattr(settings, 'WORKFLOW_APPROVAL_QUORUM', {}).get(group_name, 'all')
+    if quorum == 'all':
+        return group_size
+    return max(1, min(int(quorum), group_size))
+
 class WorkflowStage(models.TextChoices):
     FILLING = 'FILLING', 'Filling Stage'
     APPROVAL = 'APPROVAL', 'Approval Stage'
@@ -37,6 +48,12 @@ class WorkflowDocument(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [
+            # Used by archive_workflow to find old completed documents
+            models.Index(fields=['current_stage', 'updated_at']),
+        ]
+    
     def __str__(self):
         return f"Document {self.id} - {self.current_stage}"
     
@@ -49,9 +66,11 @@ class ApprovalRecord(models.Model):
         PENDING = 'PENDING', 'Pending'
         APPROVED = 'APPROVED', 'Approved'
         REJECTED = 'REJECTED', 'Rejected'
+        RETIRED = 'RETIRED', 'Retired'
     
     document = models.ForeignKey(WorkflowDocument, on_delete=models.CASCADE, related_name='approvals')
     approver = models.ForeignKey(User, on_delete=models.CASCADE)
+    group = models.CharField(max_length=150, blank=True, null=True)
     status = models.CharField(max_length=20, choices=ApprovalStatus.choices, default=ApprovalStatus.PENDING)
     comments = models.TextField(blank=True, null=True)
     approved_at = models.DateTimeField(null=True, blank=True)
@@ -61,4 +80,55 @@ class ApprovalRecord(models.Model):
         unique_together = ['document', 'approver']
     
     def __str__(self):
-        return f"{self.approver.username} - {self.document.id} - {self.status}"
\ No newline at end of file
+        return f"{self.approver.username} - {self.document.id} - {self.status}"
+
+class ApprovalGroupCounter(models.Model):
+    document = models.ForeignKey(WorkflowDocument, on_delete=models.CASCADE, related_name='approval_counters')
+    group = models.CharField(max_length=150)
+    required = models.PositiveIntegerField(default=1)
+    approved = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['document', 'group']
+    
+    def __str__(self):
+        return f"{self.document.id} - {self.group} - {self.approved}/{self.required}"
+    
+    def is_met(self):
+        return self.approved >= self.required
+
+
+class ArchivedDocument(models.Model):
+    # Completed documents moved out of WorkflowDocument by archive_workflow.
+    # The id is kept so archived documents are still reachable by their
+    # original URL, and the snapshot is the frozen serializer output.
+    id = models.BigIntegerField(primary_key=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, related_name='archived_documents', null=True)
+    snapshot = models.JSONField()
+    created_at = models.DateTimeField()
+    completed_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"Archived document {self.id}"
+    
+    def get_status_data(self):
+        return {
+            'document_id': self.id,
+            'current_stage': self.snapshot['current_stage'],
+            'current_filler_step': self.snapshot['current_filler_step'],
+            'all_fields_filled': all(self.snapshot.get(f'field{i}') for i in range(1, 12)),
+            'approvals': self.snapshot['approvals'],
+        }
+
+class ArchivedApprovalRecord(models.Model):
+    # Compact, queryable copy of an approval; comments and timestamps other
+    # than approved_at only live in the document snapshot
+    document = models.ForeignKey(ArchivedDocument, on_delete=models.CASCADE, related_name='approvals')
+    approver = models.ForeignKey(User, on_delete=models.SET_NULL, related_name='archived_approvals', null=True)
+    group = models.CharField(max_length=150, blank=True, null=True)
+    status = models.CharField(max_length=20, choices=ApprovalRecord.ApprovalStatus.choices)
+    approved_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"{self.approver_id} - {self.document_id} - {self.status}"
@@ -0,0 +1,40 @@
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    # Renders compact JSON with orjson when it is installed and falls back
+    # to DRF's stdlib renderer otherwise. Indented output (browsable API or
+    # an explicit `indent` media type parameter) always uses the fallback.
+    encoder = encoders.JSONEncoder()
+    line_separators = (
+        ('\u2028'.encode(), b'\\u2028'),
+        ('\u2029'.encode(), b'\\u2029'),
+    )
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Hand datetimes to DRF's encoder (which writes 'Z' for UTC) and
+        # accept non-string dict keys, so the output matches JSONRenderer
+        ret = orjson.dumps(
+            data,
+            default=self.encoder.default,
+            option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        )
+
+        # Keep the output a strict javascript subset, like JSONRenderer
+        for raw, escaped in self.line_separators:
+            if raw in ret:
+                ret = ret.replace(raw, escaped)
+        return ret
@@ -58,7 +58,7 @@ class ApprovalRecordSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = ApprovalRecord
-        fields = ['id', 'approver', 'approver_name', 'status', 'comments', 'approved_at', 'created_at']
+        fields = ['id', 'approver', 'approver_name', 'group', 'status', 'comments', 'approved_at', 'created_at']
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
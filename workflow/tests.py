@@ -1,3 +1,588 @@
-from django.test import TestCase
+import gzip
+import io
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.db import OperationalError, connections, router
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.contrib.auth.models import User, Group
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.utils import timezone
+from django.http import HttpResponse
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from .db_routers import ReadReplicaRouter, read_from_replica
+from .middleware import CompressionMiddleware, LoadSheddingMiddleware, ReplicaRoutingMiddleware
+from .parsers import FastJSONParser
+from .renderers import FastJSONRenderer
+from .models import (
+    WorkflowDocument,
+    ApprovalRecord,
+    ApprovalGroupCounter,
+    ArchivedDocument,
+    ArchivedApprovalRecord
+)
+from .views import WorkflowDocumentViewSet
+from .throttling import CacheRateStore, InMemoryRateStore, WorkflowRateThrottle, get_throttle_store
+
+# TestCase data is never committed, so a TEST.MIRROR replica cannot see it;
+# only ReplicaRoutingTests exercise the replica
+primary_only = override_settings(
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+    WORKFLOW_READ_REPLICAS=[]
+)
+
+@primary_only
+class ApprovalQuorumTests(TestCase):
+    def setUp(self):
+        get_throttle_store().clear()
+        with open(os.devnull, 'w') as devnull:
+            call_command('setup_workflow', stdout=devnull)
+
+        # ApproverGroup ends up with user4, ap1 and ap2
+        approver_group = Group.objects.get(name='ApproverGroup')
+        for username in ['ap1', 'ap2']:
+            User.objects.create_user(username).groups.add(approver_group)
+
+        self.document = WorkflowDocument.objects.create(
+            current_filler_step=3,
+            **{f'field{i}': 'value' for i in range(1, 9)}
+        )
+
+    def client_for(self, username):
+        client = APIClient()
+        client.force_authenticate(User.objects.get(username=username))
+        return client
+
+    def submit(self):
+        self.document.current_stage = 'FILLING'
+        self.document.current_filler_step = 3
+        self.document.save()
+        response = self.client_for('user3').patch(
+            f'/api/documents/{self.document.id}/',
+            {f'field{i}': 'value' for i in range(9, 12)},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.document.refresh_from_db()
+        self.assertEqual(self.document.current_stage, 'APPROVAL')
+
+    def act(self, username, action='approve'):
+        response = self.client_for(username).post(
+            f'/api/documents/{self.document.id}/approve/',
+            {'action': action},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.document.refresh_from_db()
+        return response
+
+    def counter(self, group):
+        return ApprovalGroupCounter.objects.get(document=self.document, group=group)
+
+    def record(self, username):
+        return ApprovalRecord.objects.get(document=self.document, approver__username=username)
+
+    @override_settings(WORKFLOW_APPROVAL_QUORUM={'ApproverGroup': 1})
+    def test_quorum_met_early(self):
+        self.submit()
+        self.assertEqual(self.counter('ApproverGroup').required, 1)
+
+        self.act('ap1')
+        self.assertEqual(self.record('ap2').status, 'RETIRED')
+        self.assertEqual(self.record('user4').status, 'RETIRED')
+        self.assertEqual(self.document.current_stage, 'APPROVAL')
+
+        for username in ['user1', 'user2', 'user3']:
+            self.act(username)
+        self.assertEqual(self.document.current_stage, 'COMPLETED')
+
+    def test_all_members_needed_by_default(self):
+        self.submit()
+        self.assertEqual(self.counter('ApproverGroup').required, 3)
+
+        for username in ['ap1', 'user1', 'user2', 'user3']:
+            self.act(username)
+        self.assertEqual(self.document.current_stage, 'APPROVAL')
+        self.assertEqual(self.record('ap2').status, 'PENDING')
+
+    def test_duplicate_approve_not_counted_twice(self):
+        self.submit()
+        self.act('ap1')
+        self.act('ap1')
+        self.assertEqual(self.counter('ApproverGroup').approved, 1)
+
+    @override_settings(WORKFLOW_APPROVAL_QUORUM={'ApproverGroup': 1})
+    def test_retired_approver_cannot_act(self):
+        self.submit()
+        self.act('ap1')
+
+        for action in ['approve', 'reject']:
+            response = self.client_for('ap2').post(
+                f'/api/documents/{self.document.id}/approve/',
+                {'action': action},
+                format='json'
+            )
+            self.assertEqual(response.status_code, 403)
+
+        self.document.refresh_from_db()
+        self.assertEqual(self.document.current_stage, 'APPROVAL')
+        self.assertEqual(self.counter('ApproverGroup').approved, 1)
+        self.assertEqual(self.record('ap2').status, 'RETIRED')
+
+    def test_reject_resets_counters(self):
+        self.submit()
+        self.act('ap1')
+        self.act('user1')
+        self.act('user2', action='reject')
+
+        self.assertEqual(self.document.current_stage, 'FILLING')
+        self.assertFalse(
+            ApprovalGroupCounter.objects.filter(document=self.document, approved__gt=0).exists()
+        )
+        self.assertFalse(
+            ApprovalRecord.objects.filter(document=self.document).exclude(status='PENDING').exists()
+        )
+
+    def test_reapproval_after_resubmit(self):
+        self.submit()
+        self.act('ap1')
+        self.act('user1', action='reject')
+
+        # Move ap1 to another group between rounds
+        ap1 = User.objects.get(username='ap1')
+        ap1.groups.set([Group.objects.get(name='FillerGroup3')])
+        self.submit()
+        self.assertEqual(self.record('ap1').group, 'FillerGroup3')
+        self.assertEqual(self.counter('FillerGroup3').required, 2)
+        self.assertEqual(self.counter('ApproverGroup').required, 2)
+
+        for username in ['ap1', 'ap2', 'user1', 'user2', 'user3', 'user4']:
+            self.act(username)
+        self.assertEqual(self.document.current_stage, 'COMPLETED')
+
+    def test_legacy_records_without_group(self):
+        self.document.current_stage = 'APPROVAL'
+        self.document.save()
+        for username in ['user1', 'user2']:
+            ApprovalRecord.objects.create(
+                document=self.document,
+                approver=User.objects.get(username=username),
+                status='PENDING'
+            )
+
+        self.act('user1')
+        self.assertEqual(self.document.current_stage, 'APPROVAL')
+        self.act('user2')
+        self.assertEqual(self.document.current_stage, 'COMPLETED')
+
+
+@primary_only
+class ArchiveWorkflowTests(TestCase):
+    def setUp(self):
+        get_throttle_store().clear()
+        self.user = User.objects.create_user('user4')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_document(self, stage='COMPLETED', age_days=60):
+        document = WorkflowDocument.objects.create(
+            current_stage=stage,
+            current_filler_step=3,
+            created_by=self.user,
+            **{f'field{i}': 'value' for i in range(1, 12)}
+        )
+        ApprovalRecord.objects.create(
+            document=document,
+            approver=self.user,
+            group='ApproverGroup',
+            status='APPROVED',
+            comments='Looks good',
+            approved_at=timezone.now()
+        )
+        ApprovalGroupCounter.objects.create(document=document, group='ApproverGroup', required=1, approved=1)
+        # auto_now would overwrite updated_at on save()
+        WorkflowDocument.objects.filter(pk=document.pk).update(
+            updated_at=timezone.now() - timedelta(days=age_days)
+        )
+        return document
+
+    def archive(self, *args):
+        stdout, stderr = io.StringIO(), io.StringIO()
+        call_command('archive_workflow', '--older-than', '30', *args, stdout=stdout, stderr=stderr)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_completed_document_leaves_hot_tables(self):
+        document = self.create_document()
+        stdout, _ = self.archive()
+
+        self.assertIn('1 documents archived', stdout)
+        self.assertFalse(WorkflowDocument.objects.exists())
+        self.assertFalse(ApprovalRecord.objects.exists())
+        self.assertFalse(ApprovalGroupCounter.objects.exists())
+
+        archived = ArchivedDocument.objects.get(pk=document.pk)
+        self.assertEqual(archived.created_by, self.user)
+        approval = ArchivedApprovalRecord.objects.get(document=archived)
+        self.assertEqual((approval.approver, approval.group, approval.status), (self.user, 'ApproverGroup', 'APPROVED'))
+
+    def test_reads_are_unchanged_after_archiving(self):
+        document = self.create_document()
+        urls = [f'/api/documents/{document.id}/', f'/api/documents/{document.id}/status/']
+        before = [self.client.get(url).json() for url in urls]
+
+        self.archive()
+        for url, expected in zip(urls, before):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json(), expected)
+
+    def test_writes_to_archived_documents_are_not_found(self):
+        document = self.create_document()
+        self.archive()
+
+        url = f'/api/documents/{document.id}/'
+        self.assertEqual(self.client.patch(url, {'field1': 'x'}, format='json').status_code, 404)
+        self.assertEqual(self.client.put(url, {'field1': 'x'}, format='json').status_code, 404)
+        self.assertEqual(self.client.delete(url).status_code, 404)
+        response = self.client.post(f'{url}approve/', {'action': 'reject'}, format='json')
+        self.assertEqual(response.status_code, 404)
+        self.assertTrue(ArchivedDocument.objects.filter(pk=document.pk).exists())
+
+    def test_unfinished_and_recent_documents_are_left_alone(self):
+        kept = [
+            self.create_document(stage='FILLING'),
+            self.create_document(stage='APPROVAL'),
+            self.create_document(age_days=1),
+        ]
+        stdout, _ = self.archive()
+
+        self.assertIn('0 documents archived', stdout)
+        self.assertEqual(WorkflowDocument.objects.count(), len(kept))
+        self.assertFalse(ArchivedDocument.objects.exists())
+
+    def test_dry_run_changes_nothing(self):
+        self.create_document()
+        stdout, _ = self.archive('--dry-run')
+
+        self.assertIn('1 documents would be archived', stdout)
+        self.assertEqual(WorkflowDocument.objects.count(), 1)
+        self.assertFalse(ArchivedDocument.objects.exists())
+
+    def test_archives_in_batches(self):
+        documents = [self.create_document() for _ in range(3)]
+        stdout, _ = self.archive('--batch-size', '2')
+
+        self.assertIn('Archived 2 documents', stdout)
+        self.assertIn('Archived 3 documents', stdout)
+        self.assertEqual(
+            set(ArchivedDocument.objects.values_list('id', flat=True)),
+            {document.id for document in documents}
+        )
+        self.assertEqual(ArchivedApprovalRecord.objects.count(), 3)
+
+    def test_deleting_a_user_keeps_archived_approvals(self):
+        self.create_document()
+        self.archive()
+        self.user.delete()
+
+        approval = ArchivedApprovalRecord.objects.get()
+        self.assertIsNone(approval.approver)
+        self.assertIsNone(approval.document.created_by)
+
+    def test_already_archived_ids_are_skipped(self):
+        document = self.create_document()
+        other = self.create_document()
+        ArchivedDocument.objects.create(
+            id=document.id,
+            snapshot={},
+            created_at=timezone.now(),
+            completed_at=timezone.now()
+        )
+
+        stdout, stderr = self.archive()
+        self.assertIn(f'already archived: {document.id}', stderr)
+        self.assertIn('1 documents archived', stdout)
+        self.assertTrue(WorkflowDocument.objects.filter(pk=document.pk).exists())
+        self.assertFalse(WorkflowDocument.objects.filter(pk=other.pk).exists())
+        self.assertEqual(ArchivedDocument.objects.get(pk=document.pk).snapshot, {})
+
+
+class RateStoreTests(SimpleTestCase):
+    def spend_concurrently(self, store, capacity, threads=20, attempts=10):
+        allowed = []
+        now = time.time()
+
+        def spend():
+            for _ in range(attempts):
+                allowed.append(store.consume('bucket', capacity, 0.0001, now, 60)[0])
+
+        workers = [threading.Thread(target=spend) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return allowed.count(True)
+
+    def test_in_memory_store_never_spends_a_token_twice(self):
+        self.assertEqual(self.spend_concurrently(InMemoryRateStore(), 50), 50)
+
+    def test_cache_store_never_spends_a_token_twice(self):
+        store = CacheRateStore()
+        store.clear()
+        store.lock_attempts = 1000
+        self.assertEqual(self.spend_concurrently(store, 50), 50)
+
+    def test_cache_store_keeps_a_lock_it_does_not_own(self):
+        store = CacheRateStore()
+        store.clear()
+        real_get = store.cache.get
+
+        def steal_lock(key, default=None):
+            # Simulate our lock expiring and another worker taking it
+            if key.endswith('_lock'):
+                store.cache.set(key, 'other-worker')
+            return real_get(key, default)
+
+        with mock.patch.object(store.cache, 'get', steal_lock):
+            store.consume('bucket', 5, 1, time.time(), 60)
+        self.assertEqual(real_get('bucket_lock'), 'other-worker')
+
+
+@primary_only
+class ThrottleScopeTests(TestCase):
+    rates = {'list': '1/min', 'status': '1/min', 'approve': '1/min', 'login': '1/min'}
+
+    def setUp(self):
+        get_throttle_store().clear()
+        patcher = mock.patch.object(WorkflowRateThrottle, 'THROTTLE_RATES', self.rates)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('poller'))
+        self.document = WorkflowDocument.objects.create()
+
+    def assertThrottled(self, send):
+        self.assertNotEqual(send().status_code, 429)
+        response = send()
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+
+    def test_list_is_throttled(self):
+        self.assertThrottled(lambda: self.client.get('/api/documents/'))
+
+    def test_status_is_throttled(self):
+        self.assertThrottled(lambda: self.client.get(f'/api/documents/{self.document.id}/status/'))
+
+    def test_approve_is_throttled(self):
+        self.assertThrottled(lambda: self.client.post(
+            f'/api/documents/{self.document.id}/approve/', {'action': 'approve'}, format='json'
+        ))
+
+    def test_login_is_throttled(self):
+        client = APIClient()
+        self.assertThrottled(lambda: client.post(
+            '/api/auth/login/', {'username': 'poller', 'password': 'wrong'}, format='json'
+        ))
+
+    def test_unscoped_actions_are_not_throttled(self):
+        for _ in range(3):
+            response = self.client.get(f'/api/documents/{self.document.id}/')
+            self.assertEqual(response.status_code, 200)
+
+
+class LoadSheddingMiddlewareTests(SimpleTestCase):
+    def build(self, get_response, max_inflight=1):
+        with self.settings(WORKFLOW_MAX_INFLIGHT_REQUESTS=max_inflight, WORKFLOW_SHED_RETRY_AFTER=2):
+            return LoadSheddingMiddleware(get_response)
+
+    def test_sheds_requests_over_the_limit(self):
+        nested = []
+
+        def busy_view(request):
+            # A second request arrives while this one is still in flight
+            nested.append(middleware(request))
+            return HttpResponse()
+
+        middleware = self.build(busy_view)
+        response = middleware(RequestFactory().get('/api/documents/'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(nested[0].status_code, 503)
+        self.assertEqual(nested[0]['Retry-After'], '2')
+        self.assertEqual(middleware.inflight, 0)
+
+    def test_inflight_is_released_when_the_view_raises(self):
+        def broken_view(request):
+            raise ValueError('boom')
+
+        middleware = self.build(broken_view)
+        with self.assertRaises(ValueError):
+            middleware(RequestFactory().get('/api/documents/'))
+        self.assertEqual(middleware.inflight, 0)
+
+    def test_disabled_without_a_limit(self):
+        middleware = self.build(lambda request: HttpResponse(), max_inflight=None)
+        self.assertEqual(middleware(RequestFactory().get('/')).status_code, 200)
+
+
+class FastJSONTests(SimpleTestCase):
+    data = {
+        'id': 1,
+        'field1': 'caf\u00e9 \u2028 \u2029',
+        'created_at': datetime(2026, 10, 19, 8, 30, 15, 123456, tzinfo=dt_timezone.utc),
+        'amount': Decimal('1.50'),
+        'approvals': [{'status': 'APPROVED', 'comments': None}],
+        2: 'non-string key',
+    }
+
+    def test_matches_json_renderer(self):
+        self.assertEqual(FastJSONRenderer().render(self.data), JSONRenderer().render(self.data))
+
+    def test_line_separators_are_escaped(self):
+        content = FastJSONRenderer().render({'text': '\u2028\u2029'})
+        self.assertEqual(content, b'{"text":"\\u2028\\u2029"}')
+
+    def test_indent_falls_back_to_json_renderer(self):
+        media_type = 'application/json; indent=4'
+        self.assertEqual(
+            FastJSONRenderer().render(self.data, media_type),
+            JSONRenderer().render(self.data, media_type)
+        )
+
+    def test_without_orjson_uses_json_renderer(self):
+        with mock.patch('workflow.renderers.orjson', None):
+            self.assertEqual(FastJSONRenderer().render(self.data), JSONRenderer().render(self.data))
+
+    def test_parser_round_trip(self):
+        data = {'field1': 'caf\u00e9', 'approvals': [{'status': 'APPROVED'}], 'step': 2}
+        content = FastJSONRenderer().render(data)
+        self.assertEqual(FastJSONParser().parse(io.BytesIO(content)), data)
+
+    def test_parser_rejects_invalid_json(self):
+        with self.assertRaises(ParseError):
+            FastJSONParser().parse(io.BytesIO(b'{"field1": '))
+
+    def test_parser_rejects_invalid_utf8(self):
+        with self.assertRaises(ParseError):
+            FastJSONParser().parse(io.BytesIO(b'{"field1": "\xff"}'))
+
+
+class CompressionMiddlewareTests(SimpleTestCase):
+    def get(self, content_type, min_size=100):
+        body = b'{"field1": "value"}' * 100
+        response = HttpResponse(body, content_type=content_type)
+        with self.settings(WORKFLOW_COMPRESSION_MIN_SIZE=min_size):
+            middleware = CompressionMiddleware(lambda request: response)
+        request = RequestFactory().get('/api/documents/', HTTP_ACCEPT_ENCODING='gzip')
+        return middleware(request)
+
+    def test_json_is_gzipped(self):
+        response = self.get('application/json')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), b'{"field1": "value"}' * 100)
+
+    def test_html_is_not_compressed(self):
+        self.assertFalse(self.get('text/html; charset=utf-8').has_header('Content-Encoding'))
+
+    def test_disabled_by_default(self):
+        self.assertFalse(self.get('application/json', min_size=None).has_header('Content-Encoding'))
+
+
+@skipUnless('replica' in settings.DATABASES, 'needs workflow_project.settings_replica')
+class ReplicaRoutingTests(TransactionTestCase):
+    # Run with DJANGO_SETTINGS_MODULE=workflow_project.settings_replica; the
+    # replica alias mirrors the test database via TEST.MIRROR, so the data
+    # has to be committed for the replica connection to see it.
+    databases = '__all__'
+
+    def setUp(self):
+        get_throttle_store().clear()
+        self.router = next(r for r in router.routers if isinstance(r, ReadReplicaRouter))
+        self.router.checked_until.clear()
+        self.router.unhealthy_until.clear()
+        caches[settings.WORKFLOW_PIN_CACHE].clear()
+        self.client = self.client_for(User.objects.create_user('reader'))
+
+    def client_for(self, user):
+        # Pins are keyed on the user id in the bearer token
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+        return client
+
+    def read_aliases(self, url, client=None):
+        # Perform a request and return the aliases the router picked for reads
+        aliases = []
+        original = ReadReplicaRouter.db_for_read
+
+        def record(router_self, model, **hints):
+            alias = original(router_self, model, **hints)
+            # Pin lookups in the database cache always use the primary
+            if model._meta.app_label != 'django_cache':
+                aliases.append(alias)
+            return alias
+
+        with mock.patch.object(ReadReplicaRouter, 'db_for_read', record):
+            response = (client or self.client).get(url)
+        self.assertEqual(response.status_code, 200)
+        return set(aliases)
+
+    def test_safe_requests_read_from_replica(self):
+        self.assertEqual(self.read_aliases('/api/documents/'), {'replica'})
+
+    def test_write_pins_user_to_primary(self):
+        response = self.client.post('/api/documents/', {}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.read_aliases('/api/documents/'), {'default'})
+
+        # The pin follows the user, not a cookie or a particular client
+        self.assertEqual(self.read_aliases('/api/documents/', self.client_for(User.objects.get(username='reader'))), {'default'})
+
+        other = self.client_for(User.objects.create_user('other'))
+        self.assertEqual(self.read_aliases('/api/documents/', other), {'replica'})
+
+    def test_local_memory_pin_cache_is_rejected(self):
+        with self.settings(WORKFLOW_PIN_CACHE='default'):
+            with self.assertRaises(ImproperlyConfigured):
+                ReplicaRoutingMiddleware(lambda request: HttpResponse())
+
+    def test_replica_failing_probe_is_skipped(self):
+        with mock.patch.object(connections['replica'], 'cursor', side_effect=OperationalError):
+            self.assertEqual(self.read_aliases('/api/documents/'), {'default'})
+        self.assertIn('replica', self.router.unhealthy_until)
+
+    def test_replica_query_error_retries_on_primary(self):
+        original = WorkflowDocumentViewSet.list
+
+        def flaky_list(viewset, request, *args, **kwargs):
+            if read_from_replica.get():
+                # Fail as a query on an unmigrated replica would
+                with connections['replica'].cursor() as cursor:
+                    cursor.execute('SELECT 1 FROM missing_table')
+            return original(viewset, request, *args, **kwargs)
+
+        with mock.patch.object(WorkflowDocumentViewSet, 'list', flaky_list):
+            response = self.client.get('/api/documents/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('replica', self.router.unhealthy_until)
+
+    def test_primary_query_error_keeps_replica(self):
+        def failing_list(viewset, request, *args, **kwargs):
+            WorkflowDocument.objects.exists()
+            with connections['default'].cursor() as cursor:
+                cursor.execute('SELECT 1 FROM missing_table')
+
+        with mock.patch.object(WorkflowDocumentViewSet, 'list', failing_list):
+            with self.assertRaises(OperationalError):
+                self.client.get('/api/documents/')
+        self.assertNotIn('replica', self.router.unhealthy_until)
@@ -0,0 +1,163 @@
+import threading
+import time
+import uuid
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+from rest_framework.throttling import ScopedRateThrottle
+
+
+def take_token(state, capacity, refill_rate, now):
+    # Refill the bucket for the time since it was last written, then try to
+    # take one token from it. Returns (allowed, tokens left).
+    tokens, last = state or (capacity, now)
+    tokens = min(capacity, tokens + max(0, now - last) * refill_rate)
+    if tokens < 1:
+        return False, tokens
+    return True, tokens - 1
+
+
+class InMemoryRateStore:
+    # Process-local store; every write pushes the key's expiry forward so
+    # idle buckets drop out once their window has passed.
+    prune_every = 1000
+
+    def __init__(self, timer=time.monotonic):
+        self.timer = timer
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.writes = 0
+
+    def get(self, key, default=None):
+        entry = self.entries.get(key)
+        if entry is None or entry[1] <= self.timer():
+            return default
+        return entry[0]
+
+    def set(self, key, value, timeout):
+        with self.lock:
+            self.write(key, value, timeout)
+
+    def consume(self, key, capacity, refill_rate, now, timeout):
+        # The read-modify-write happens under the lock so concurrent
+        # requests can never spend the same token twice
+        with self.lock:
+            allowed, tokens = take_token(self.get(key), capacity, refill_rate, now)
+            if allowed:
+                self.write(key, (tokens, now), timeout)
+        return allowed, tokens
+
+    def write(self, key, value, timeout):
+        now = self.timer()
+        self.entries[key] = (value, now + timeout)
+        self.writes += 1
+        if self.writes % self.prune_every == 0:
+            self.prune(now)
+
+    def prune(self, now):
+        expired = [key for key, (_, expires_at) in self.entries.items() if expires_at <= now]
+        for key in expired:
+            del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class CacheRateStore:
+    # Shared store backed by Django's cache framework (e.g. Redis or
+    # Memcached), so every worker process sees the same buckets. Updates to
+    # a bucket are serialised with a short-lived lock taken via cache.add.
+    # The lock is best-effort: it holds a unique token and is only released
+    # by its owner, but an update slower than lock_timeout loses it.
+    lock_timeout = 1
+    lock_attempts = 20
+    lock_wait = 0.001
+
+    def __init__(self, alias='default'):
+        self.alias = alias
+
+    @property
+    def cache(self):
+        from django.core.cache import caches
+        return caches[self.alias]
+
+    def get(self, key, default=None):
+        return self.cache.get(key, default)
+
+    def set(self, key, value, timeout):
+        self.cache.set(key, value, timeout)
+
+    def consume(self, key, capacity, refill_rate, now, timeout):
+        cache = self.cache
+        lock_key = f'{key}_lock'
+        lock_token = uuid.uuid4().hex
+        for _ in range(self.lock_attempts):
+            if cache.add(lock_key, lock_token, self.lock_timeout):
+                break
+            time.sleep(self.lock_wait)
+        else:
+            # Heavy contention on a single bucket - treat it as throttled
+            return False, 0
+
+        try:
+            allowed, tokens = take_token(cache.get(key), capacity, refill_rate, now)
+            if allowed:
+                cache.set(key, (tokens, now), timeout)
+            return allowed, tokens
+        finally:
+            # Don't release a lock another worker took after ours expired
+            if cache.get(lock_key) == lock_token:
+                cache.delete(lock_key)
+
+    def clear(self):
+        self.cache.clear()
+
+
+@lru_cache(maxsize=None)
+def get_throttle_store():
+    store_path = getattr(settings, 'WORKFLOW_THROTTLE_STORE', 'workflow.throttling.InMemoryRateStore')
+    return import_string(store_path)()
+
+
+class WorkflowRateThrottle(ScopedRateThrottle):
+    """
+    Token-bucket throttle keyed by user (or client IP) and scope.
+
+    The scope comes from `view.throttle_scopes[view.action]` for viewsets
+    or `view.throttle_scope` for plain views. A rate of '60/min' gives a
+    bucket of 60 tokens refilled at one token per second, so short bursts
+    are allowed while the sustained rate stays capped.
+    """
+    cache = None
+    cache_format = 'workflow_throttle_%(scope)s_%(ident)s'
+    # Wall-clock time, since buckets may be shared between hosts
+    timer = time.time
+
+    def allow_request(self, request, view):
+        scopes = getattr(view, 'throttle_scopes', None) or {}
+        self.scope = scopes.get(getattr(view, 'action', None)) or getattr(view, self.scope_attr, None)
+
+        if not self.scope:
+            return True
+
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        if self.num_requests is None:
+            return True
+
+        self.store = get_throttle_store()
+        self.key = self.get_cache_key(request, view)
+        self.now = self.timer()
+        self.refill_rate = self.num_requests / self.duration
+
+        allowed, self.tokens = self.store.consume(
+            self.key, self.num_requests, self.refill_rate, self.now, self.duration
+        )
+        if not allowed:
+            return self.throttle_failure()
+        return True
+
+    def wait(self):
+        return (1 - self.tokens) / self.refill_rate
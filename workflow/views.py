@@ -1,12 +1,22 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
 from rest_framework.views import APIView
 from rest_framework_simplejwt.views import TokenObtainPairView
+from django.db.models import F
+from django.http import Http404
 from django.utils import timezone
 from django.contrib.auth.models import User
-from .models import WorkflowDocument, ApprovalRecord
+from .models import (
+    WorkflowDocument,
+    ApprovalRecord,
+    ApprovalGroupCounter,
+    ArchivedDocument,
+    APPROVER_GROUPS,
+    get_group_quorum
+)
 from .serializers import (
     WorkflowDocumentSerializer, 
     ApprovalRecordSerializer, 
@@ -17,11 +27,17 @@ from .permissions import WorkflowPermission
 
 class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
+    throttle_scope = 'login'
 
 class WorkflowDocumentViewSet(viewsets.ModelViewSet):
     queryset = WorkflowDocument.objects.all().order_by('-created_at')
     serializer_class = WorkflowDocumentSerializer
     permission_classes = [WorkflowPermission]
+    throttle_scopes = {
+        'list': 'list',
+        'status': 'status',
+        'approve': 'approve',
+    }
     
     def get_serializer(self, *args, **kwargs):
         kwargs['context'] = {'request': self.request}
@@ -98,21 +114,35 @@ class WorkflowDocumentViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
         
+        if approval.status == 'RETIRED':
+            # The approver's group already met its quorum
+            return Response(
+                {'error': 'Your approval is no longer required for this document'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
         action_type = request.data.get('action')
         comments = request.data.get('comments', '')
         
         if action_type == 'approve':
-            approval.status = 'APPROVED'
-            approval.approved_at = timezone.now()
-            approval.comments = comments
-            approval.save()
+            # Conditional update so a repeated approve never counts twice
+            updated = ApprovalRecord.objects.filter(pk=approval.pk).exclude(
+                status='APPROVED'
+            ).update(
+                status='APPROVED',
+                approved_at=timezone.now(),
+                comments=comments
+            )
             
-            # Check if all approvers have approved
-            all_approvals = ApprovalRecord.objects.filter(document=document)
-            if all(a.status == 'APPROVED' for a in all_approvals):
+            if updated and self.is_quorum_met(document, approval):
                 document.current_stage = 'COMPLETED'
                 document.save()
                 
+                # Retire everyone who no longer needs to approve
+                ApprovalRecord.objects.filter(document=document, status='PENDING').update(
+                    status='RETIRED'
+                )
+                
         elif action_type == 'reject':
             approval.status = 'REJECTED'
             approval.comments = comments
@@ -129,13 +159,24 @@ class WorkflowDocumentViewSet(viewsets.ModelViewSet):
                 comments='',
                 approved_at=None
             )
+            ApprovalGroupCounter.objects.filter(document=document).update(approved=0)
         
         serializer = self.get_serializer(document)
         return Response(serializer.data)
     
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            return super().retrieve(request, *args, **kwargs)
+        except Http404:
+            return Response(self.get_archived_document().snapshot)
+    
     @action(detail=True, methods=['get'])
     def status(self, request, pk=None):
-        document = self.get_object()
+        try:
+            document = self.get_object()
+        except Http404:
+            return Response(self.get_archived_document().get_status_data())
+        
         data = {
             'document_id': document.id,
             'current_stage': document.current_stage,
@@ -149,27 +190,75 @@ class WorkflowDocumentViewSet(viewsets.ModelViewSet):
         return Response(data)
     
     def create_approval_records(self, document):
-        # Get all users from ApproverGroup and the three filler users
-        approver_users = []
-        
-        # Add users from groups
-        for group_name in ['FillerGroup1', 'FillerGroup2', 'FillerGroup3', 'ApproverGroup']:
-            users = User.objects.filter(groups__name=group_name)
-            approver_users.extend(users)
+        # Get all users from the approver groups, remembering the first group
+        # each user was found in so approvals can be counted per group
+        approver_groups = {}
+        for user in User.objects.filter(groups__name__in=APPROVER_GROUPS).prefetch_related('groups'):
+            names = {group.name for group in user.groups.all()}
+            approver_groups[user] = next(name for name in APPROVER_GROUPS if name in names)
         
         # Fallback for testing - add specific users
-        for username in ['user1', 'user2', 'user3', 'user4']:
-            user = User.objects.filter(username=username).first()
-            if user and user not in approver_users:
-                approver_users.append(user)
-        
-        # Create approval records
-        for user in approver_users:
-            ApprovalRecord.objects.get_or_create(
+        fallback_users = User.objects.filter(username__in=['user1', 'user2', 'user3', 'user4'])
+        for user in fallback_users:
+            if user not in approver_groups:
+                role = self.get_user_role(user)
+                approver_groups[user] = APPROVER_GROUPS[role - 1] if role else None
+        
+        # Drop records of users who are no longer approvers, then create the
+        # missing ones. Records kept from an earlier round (after a reject)
+        # take the user's current group so they match the counters below.
+        ApprovalRecord.objects.filter(document=document).exclude(
+            approver__in=list(approver_groups)
+        ).delete()
+        ApprovalRecord.objects.bulk_create(
+            [
+                ApprovalRecord(document=document, approver=user, group=group_name, status='PENDING')
+                for user, group_name in approver_groups.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['document', 'approver'],
+            update_fields=['group']
+        )
+        
+        # Create one quorum counter per group
+        group_sizes = {}
+        for group_name in approver_groups.values():
+            if group_name:
+                group_sizes[group_name] = group_sizes.get(group_name, 0) + 1
+        
+        ApprovalGroupCounter.objects.filter(document=document).delete()
+        ApprovalGroupCounter.objects.bulk_create([
+            ApprovalGroupCounter(
                 document=document,
-                approver=user,
-                defaults={'status': 'PENDING'}
+                group=group_name,
+                required=get_group_quorum(group_name, size)
             )
+            for group_name, size in group_sizes.items()
+        ])
+    
+    def is_quorum_met(self, document, approval):
+        counters = ApprovalGroupCounter.objects.filter(document=document)
+        if not approval.group or not counters.exists():
+            # Records created before quorum rules were introduced
+            return not ApprovalRecord.objects.filter(document=document).exclude(status='APPROVED').exists()
+        
+        group_counter = counters.filter(group=approval.group)
+        group_counter.update(approved=F('approved') + 1)
+        counter = group_counter.first()
+        if counter and counter.is_met():
+            # Group quorum reached - its remaining approvers are no longer needed
+            ApprovalRecord.objects.filter(
+                document=document,
+                group=approval.group,
+                status='PENDING'
+            ).update(status='RETIRED')
+        
+        return not counters.filter(approved__lt=F('required')).exists()
+    
+    def get_archived_document(self):
+        # Completed documents moved out by archive_workflow are read-only
+        # and only reachable through retrieve and status
+        return get_object_or_404(ArchivedDocument, pk=self.kwargs[self.lookup_field])
     
     def get_user_role(self, user):
         perm = WorkflowPermission()
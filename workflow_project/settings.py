@@ -46,13 +46,16 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'workflow.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
 
     'corsheaders.middleware.CorsMiddleware',  # Add this
+    'workflow.middleware.LoadSheddingMiddleware',
 
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'workflow.middleware.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -65,8 +68,44 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_THROTTLE_CLASSES': [
+        'workflow.throttling.WorkflowRateThrottle',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'list': '60/min',
+        'status': '120/min',
+        'approve': '30/min',
+        'login': '10/min',
+    },
 }
 
+# Throttle buckets are kept per process by default; point this at
+# 'workflow.throttling.CacheRateStore' to share them through CACHES
+WORKFLOW_THROTTLE_STORE = 'workflow.throttling.InMemoryRateStore'
+
+# Requests handled concurrently per process before new ones get a 503
+WORKFLOW_MAX_INFLIGHT_REQUESTS = 64
+WORKFLOW_SHED_RETRY_AFTER = 1
+
+# Set to True to render and parse JSON with orjson (DRF's stdlib JSON is
+# used as a fallback when orjson is not installed)
+WORKFLOW_FAST_JSON = False
+
+if WORKFLOW_FAST_JSON:
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'] = [
+        'workflow.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ]
+    REST_FRAMEWORK['DEFAULT_PARSER_CLASSES'] = [
+        'workflow.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ]
+
+# Compress responses of at least this many bytes (e.g. 1024); None
+# leaves every response uncompressed
+WORKFLOW_COMPRESSION_MIN_SIZE = None
+
 ROOT_URLCONF = 'workflow_project.urls'
 
 TEMPLATES = [
@@ -98,6 +137,22 @@ DATABASES = {
     }
 }
 
+DATABASE_ROUTERS = ['workflow.db_routers.ReadReplicaRouter']
+
+# Database aliases that serve GET/HEAD/OPTIONS requests. Leave empty to
+# send everything to 'default' (see settings_replica.py for a local setup)
+WORKFLOW_READ_REPLICAS = []
+
+# After a write, that user's reads stay on the primary for this long
+WORKFLOW_PIN_TO_PRIMARY_SECONDS = 5
+
+# Cache holding those pins; with replicas enabled it must be shared by all
+# workers, so a local-memory cache is rejected
+WORKFLOW_PIN_CACHE = 'default'
+
+# An unreachable replica is skipped for this many seconds
+WORKFLOW_REPLICA_RETRY_AFTER = 30
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -149,6 +204,12 @@ SIMPLE_JWT = {
     'ROTATE_REFRESH_TOKENS': True,
 }
 
+# Approvals needed per approver group before a document is completed.
+# Groups not listed here need every member, e.g. {'ApproverGroup': 1}.
+# Once a group meets its quorum its other members are retired and can no
+# longer approve or reject the document.
+WORKFLOW_APPROVAL_QUORUM = {}
+
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
     "http://127.0.0.1:3000",
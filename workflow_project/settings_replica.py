@@ -0,0 +1,38 @@
+"""
+Settings for trying read-replica routing locally.
+
+Two SQLite files stand in for the primary and the replica. SQLite does not
+replicate, so copy the primary over the replica to "sync" it. Pins for
+read-your-writes live in a database cache table on the primary:
+
+    python manage.py createcachetable --settings workflow_project.settings_replica
+    cp db.sqlite3 db_replica.sqlite3
+    DJANGO_SETTINGS_MODULE=workflow_project.settings_replica python manage.py runserver
+
+The replica routing tests only run under these settings:
+
+    DJANGO_SETTINGS_MODULE=workflow_project.settings_replica python manage.py test workflow
+"""
+
+from .settings import *  # noqa: F401,F403
+
+DATABASES['replica'] = {
+    'ENGINE': 'django.db.backends.sqlite3',
+    'NAME': BASE_DIR / 'db_replica.sqlite3',
+    'TEST': {
+        'MIRROR': 'default',
+    },
+}
+
+WORKFLOW_READ_REPLICAS = ['replica']
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'workflow_pins': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'workflow_pins',
+    },
+}
+WORKFLOW_PIN_CACHE = 'workflow_pins'